@@ -2,12 +2,31 @@
 PGP Web Application - Flask App Factory
 """
 import os
+import atexit
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from flask import Flask
+from flask.logging import default_handler
 from flask_wtf.csrf import CSRFProtect
 
 csrf = CSRFProtect()
 
+# Non-API endpoints called via AJAX that expect JSON error bodies
+_JSON_PATHS = frozenset({'/upload-file', '/encrypt-file', '/decrypt-file'})
+
+_CSRF_ERROR_PAGE = """
+<!DOCTYPE html>
+<html>
+<head><title>CSRF Error</title></head>
+<body>
+    <h1>Security Error</h1>
+    <p>CSRF token missing or invalid. Please refresh the page and try again.</p>
+    <a href="javascript:history.back()">Go Back</a>
+</body>
+</html>
+"""
+
 
 def create_app(config_name=None):
     """Create and configure the Flask application."""
@@ -20,6 +39,10 @@ def create_app(config_name=None):
     from app.config import config
     app.config.from_object(config[config_name])
 
+    # Extension checks run on every upload; keep them to one hashed lookup
+    app.config['ALLOWED_EXTENSIONS'] = frozenset(
+        ext.lower() for ext in app.config['ALLOWED_EXTENSIONS'])
+
     # Set up logging
     setup_logging(app)
 
@@ -36,21 +59,34 @@ def create_app(config_name=None):
     from app.api import bp as api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
 
+    # Compile page templates up front so the first requests don't pay for it
+    for template in ('base.html', 'index.html', 'keys.html', 'encrypt.html',
+                     'decrypt.html', 'generate_key.html'):
+        app.jinja_env.get_template(template)
+
     # Create necessary directories
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['GNUPG_HOME'], exist_ok=True)
+    _ensure_dir(app.config['UPLOAD_FOLDER'])
+    _ensure_dir(app.config['GNUPG_HOME'])
 
-    app.logger.info(f"PGP Web Application started in {config_name} mode")
-    app.logger.info(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
-    app.logger.info(f"GnuPG home: {app.config['GNUPG_HOME']}")
+    app.logger.info("PGP Web Application started in %s mode", config_name)
+    app.logger.info("Upload folder: %s", app.config['UPLOAD_FOLDER'])
+    app.logger.info("GnuPG home: %s", app.config['GNUPG_HOME'])
 
     return app
 
 
+def _ensure_dir(path):
+    """Create a directory unless it already exists."""
+    if path and not os.path.isdir(path):
+        os.makedirs(path, exist_ok=True)
+
+
 def setup_logging(app):
     """Configure logging for the application."""
     if not app.debug and not app.testing:
         # Production logging
+        log_level, bad_level = _log_level(app.config.get('LOG_LEVEL'), logging.INFO)
+
         if not os.path.exists('logs'):
             os.mkdir('logs')
 
@@ -58,23 +94,71 @@ def setup_logging(app):
         file_handler.setFormatter(logging.Formatter(
             '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
         ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-
-        app.logger.setLevel(logging.INFO)
+        file_handler.setLevel(log_level)
+
+        # Console output (what docker logs shows), in Flask's default format
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(default_handler.formatter)
+        console_handler.setLevel(log_level)
+
+        # Request threads only enqueue records; a background listener
+        # owns the file and console handlers and does the writes
+        log_queue = queue.Queue(maxsize=10000)
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.setLevel(log_level)
+        app.logger.removeHandler(default_handler)
+        app.logger.addHandler(queue_handler)
+
+        listener = QueueListener(log_queue, file_handler, console_handler,
+                                 respect_handler_level=True)
+        listener.start()
+        app.extensions['log_listener'] = listener
+        atexit.register(listener.stop)
+
+        # The level lives on the 'app' logger, which every app.* module
+        # logger inherits, so filtered calls return before a record is built
+        app.logger.setLevel(log_level)
+        if bad_level is not None:
+            app.logger.warning("Unknown LOG_LEVEL %r, using INFO", bad_level)
         app.logger.info('PGP Web Application startup')
     else:
-        # Development logging - more verbose
-        logging.basicConfig(
-            level=app.config.get('LOG_LEVEL', logging.DEBUG),
-            format='%(asctime)s %(name)s %(levelname)s: %(message)s'
-        )
-
-        # Enable debug logging for our modules
+        # Development logging - more verbose, one console handler at the root
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(
+            '%(name)s %(levelname)s: %(message)s'))
+
+        root = logging.getLogger()
+        root.handlers[:] = [handler]
+        log_level, bad_level = _log_level(app.config.get('LOG_LEVEL'), logging.DEBUG)
+        root.setLevel(log_level)
+        if bad_level is not None:
+            app.logger.warning("Unknown LOG_LEVEL %r, using DEBUG", bad_level)
+
+        # Enable debug logging for our modules; app.* children inherit it
         logging.getLogger('app').setLevel(logging.DEBUG)
-        logging.getLogger('app.services').setLevel(logging.DEBUG)
-        logging.getLogger('app.main').setLevel(logging.DEBUG)
-        logging.getLogger('app.utils').setLevel(logging.DEBUG)
+
+
+def _log_level(value, default):
+    """
+    Resolve a LOG_LEVEL setting to a level logging accepts.
+
+    Returns a (level, rejected) tuple; rejected holds the original value when
+    it was not a level name or number and default was used instead.
+    """
+    if value is None or isinstance(value, int):
+        return (default if value is None else value), None
+
+    name = str(value).strip().upper()
+    if name.isdigit():
+        return int(name), None
+    if name in logging.getLevelNamesMapping():
+        return name, None
+    return default, value
+
+
+def _wants_json(path):
+    """Return True if errors for this path should be rendered as JSON."""
+    return path.startswith('/api/') or path in _JSON_PATHS
 
 
 def setup_error_handlers(app):
@@ -84,38 +168,28 @@ def setup_error_handlers(app):
 
     @app.errorhandler(CSRFError)
     def handle_csrf_error(e):
-        app.logger.error(f"CSRF error: {e.description}")
-        app.logger.error(f"Request URL: {request.url}")
-        app.logger.error(f"Request method: {request.method}")
-        app.logger.error(f"Request headers: {dict(request.headers)}")
+        app.logger.error("CSRF error: %s path=%s method=%s content_type=%s origin=%s",
+                         e.description, request.path, request.method,
+                         request.headers.get('Content-Type'),
+                         request.headers.get('Origin'))
 
         # Return JSON for API endpoints, HTML for regular pages
-        if request.path.startswith('/api/') or request.path in ['/upload-file', '/encrypt-file', '/decrypt-file']:
+        if _wants_json(request.path):
             return jsonify({
                 'success': False,
                 'message': 'CSRF token missing or invalid. Please refresh the page and try again.',
                 'error_type': 'csrf_error'
             }), 400
         else:
-            return f"""
-            <!DOCTYPE html>
-            <html>
-            <head><title>CSRF Error</title></head>
-            <body>
-                <h1>Security Error</h1>
-                <p>CSRF token missing or invalid. Please refresh the page and try again.</p>
-                <a href="javascript:history.back()">Go Back</a>
-            </body>
-            </html>
-            """, 400
+            return _CSRF_ERROR_PAGE, 400
 
     @app.errorhandler(400)
     def handle_bad_request(e):
-        app.logger.error(f"Bad request: {e}")
-        app.logger.error(f"Request URL: {request.url}")
-        app.logger.error(f"Request method: {request.method}")
+        app.logger.error("Bad request: %s", e)
+        app.logger.error("Request URL: %s", request.url)
+        app.logger.error("Request method: %s", request.method)
 
-        if request.path.startswith('/api/') or request.path in ['/upload-file', '/encrypt-file', '/decrypt-file']:
+        if _wants_json(request.path):
             return jsonify({
                 'success': False,
                 'message': 'Bad request',
@@ -125,15 +199,14 @@ def setup_error_handlers(app):
 
     @app.errorhandler(500)
     def handle_internal_error(e):
-        app.logger.error(f"Internal server error: {e}")
-        app.logger.error(f"Request URL: {request.url}")
-        app.logger.error(f"Request method: {request.method}")
+        app.logger.error("Internal server error: %s", e)
+        app.logger.error("Request URL: %s", request.url)
+        app.logger.error("Request method: %s", request.method)
 
-        if request.path.startswith('/api/') or request.path in ['/upload-file', '/encrypt-file', '/decrypt-file']:
+        if _wants_json(request.path):
             return jsonify({
                 'success': False,
                 'message': 'Internal server error',
                 'error_type': 'server_error'
             }), 500
         return str(e), 500
-        logging.getLogger('app.utils').setLevel(logging.DEBUG)
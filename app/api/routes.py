@@ -1,28 +1,27 @@
 """
 API routes for AJAX operations
 """
-from flask import jsonify, request
-from app.services.pgp_service import PGPService
+from flask import Response, jsonify, request
+from app.services import get_pgp_service
 
 # Import bp after other imports to avoid circular import
 from app.api import bp
 
+# Armored key blocks are a few KB; anything past this is not a key paste
+MAX_KEY_DATA_LENGTH = 1024 * 1024
+
+# Health probes are polled constantly; serialize the static payload once
+_HEALTH_BODY = b'{"service":"PGP Web Application","status":"healthy"}\n'
+
 
 @bp.route('/key-info/<keyid>')
 def get_key_info(keyid):
     """Get detailed information about a key."""
     try:
-        pgp_service = PGPService()
-
-        # Try to find the key in both public and private keys
-        public_keys = pgp_service.list_keys(secret=False)
-        private_keys = pgp_service.list_keys(secret=True)
+        pgp_service = get_pgp_service()
 
-        key_info = None
-        for key in public_keys + private_keys:
-            if key['keyid'] == keyid or key['fingerprint'] == keyid:
-                key_info = key
-                break
+        # Look the key up among both public and private keys
+        key_info = pgp_service.find_key(keyid)
 
         if key_info:
             return jsonify({
@@ -45,38 +44,36 @@ def get_key_info(keyid):
 @bp.route('/validate-key', methods=['POST'])
 def validate_key():
     """Validate key data before import."""
-    try:
-        key_data = request.json.get('key_data', '')
-
-        if not key_data:
-            return jsonify({
-                'success': False,
-                'message': 'Key data is required'
-            }), 400
+    body = request.get_json(cache=False, silent=True)
+    key_data = body.get('key_data', '') if isinstance(body, dict) else ''
 
-        # Basic validation - check if it looks like a PGP key
-        if '-----BEGIN PGP' not in key_data or '-----END PGP' not in key_data:
-            return jsonify({
-                'success': False,
-                'message': 'Invalid PGP key format'
-            }), 400
+    if not key_data or not isinstance(key_data, str):
+        return jsonify({
+            'success': False,
+            'message': 'Key data is required'
+        }), 400
 
+    if len(key_data) > MAX_KEY_DATA_LENGTH:
         return jsonify({
-            'success': True,
-            'message': 'Key format appears valid'
-        })
+            'success': False,
+            'message': 'Key data is too large'
+        }), 400
 
-    except Exception as e:
+    # Basic validation - armor header must open the block, footer close it
+    key_data = key_data.strip()
+    if not key_data.startswith('-----BEGIN PGP') or '-----END PGP' not in key_data[-200:]:
         return jsonify({
             'success': False,
-            'message': f'Error validating key: {str(e)}'
-        }), 500
+            'message': 'Invalid PGP key format'
+        }), 400
+
+    return jsonify({
+        'success': True,
+        'message': 'Key format appears valid'
+    })
 
 
 @bp.route('/health')
 def health_check():
     """Health check endpoint."""
-    return jsonify({
-        'status': 'healthy',
-        'service': 'PGP Web Application'
-    })
+    return Response(_HEALTH_BODY, mimetype='application/json')
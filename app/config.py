@@ -18,9 +18,11 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, '..', 'uploads')
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'zip',
                           'gpg', 'asc', 'pgp', 'sig'}  # Added PGP-related extensions
+    STRICT_FILENAMES = False  # True: sanitize names with werkzeug's secure_filename
 
     # GnuPG settings
     GNUPG_HOME = os.path.join(basedir, '..', 'gnupg_home')
+    KEYS_CACHE_TTL = 30  # Max seconds a cached key listing is reused
 
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=1)
@@ -45,7 +47,10 @@ class ProductionConfig(Config):
     TESTING = False
 
     # Production logging
-    LOG_LEVEL = logging.INFO
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+    # Templates don't change in a deployed image; skip per-render mtime checks
+    TEMPLATES_AUTO_RELOAD = False
 
     # Override with environment variables in production
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'fallback-secret-key'
@@ -7,8 +7,9 @@ import logging
 from flask import render_template, request, flash, redirect, url_for, jsonify, send_file, current_app
 from werkzeug.utils import secure_filename
 # Import the blueprint at the bottom to avoid circular imports
-from app.services.pgp_service import PGPService
-from app.utils.file_utils import save_uploaded_file, get_file_path, delete_file, format_file_size, get_file_size
+from app.services import get_pgp_service
+from app.utils.file_utils import (save_uploaded_file, get_file_path, delete_file, format_file_size,
+                                   get_file_size, allowed_file, unique_filename)
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +25,7 @@ def index():
 @bp.route('/keys')
 def keys():
     """Key management page."""
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
 
     # Get both public and private keys
     public_keys = pgp_service.list_keys(secret=False)
@@ -38,7 +39,7 @@ def keys():
 @bp.route('/encrypt')
 def encrypt():
     """File encryption page."""
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
     public_keys = pgp_service.list_keys(secret=False)
 
     return render_template('encrypt.html', public_keys=public_keys)
@@ -63,7 +64,7 @@ def generate_key():
             flash('Name and email are required.', 'error')
             return redirect(url_for('main.generate_key'))
 
-        pgp_service = PGPService()
+        pgp_service = get_pgp_service()
         result = pgp_service.generate_key_pair(
             name=name,
             email=email,
@@ -89,7 +90,7 @@ def import_key():
         flash('Key data is required.', 'error')
         return redirect(url_for('main.keys'))
 
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
     result = pgp_service.import_key(key_data)
 
     if result['success']:
@@ -103,7 +104,7 @@ def import_key():
 @bp.route('/export-key/<keyid>')
 def export_key(keyid):
     """Export a public key."""
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
     key_data = pgp_service.export_key(keyid, secret=False)
 
     if key_data:
@@ -123,7 +124,7 @@ def delete_key(keyid):
     """Delete a key."""
     secret = request.form.get('secret') == 'true'
 
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
     result = pgp_service.delete_key(keyid, secret=secret)
 
     if result['success']:
@@ -134,16 +135,50 @@ def delete_key(keyid):
     return redirect(url_for('main.keys'))
 
 
+def _encrypt_upload(file, recipient_keys):
+    """Encrypt an uploaded file from its request stream."""
+    if not file or file.filename == '':
+        return jsonify({'success': False, 'message': 'No file selected'}), 400
+
+    if not allowed_file(file.filename):
+        logger.error("File type not allowed: %s", file.filename)
+        return jsonify({'success': False, 'message': 'File type not allowed'}), 400
+
+    name, ext = os.path.splitext(unique_filename(file.filename))
+    encrypted_filename = f"{name}_encrypted{ext}.gpg"
+    encrypted_path = get_file_path(encrypted_filename)
+
+    pgp_service = get_pgp_service()
+    result = pgp_service.encrypt_stream(
+        file.stream, recipient_keys, encrypted_path, filename=file.filename)
+
+    if result['success']:
+        file_size = os.stat(encrypted_path).st_size
+        logger.info("Upload encrypted: %s, size: %d bytes",
+                    encrypted_filename, file_size)
+        return jsonify({
+            'success': True,
+            'encrypted_filename': encrypted_filename,
+            'size': format_file_size(file_size),
+            'message': 'File encrypted successfully'
+        })
+    else:
+        return jsonify({
+            'success': False,
+            'message': result['message']
+        }), 500
+
+
 @bp.route('/upload-file', methods=['POST'])
 def upload_file():
     """Upload a file for encryption/decryption."""
     logger.info("File upload request received")
-    logger.debug(f"Request method: {request.method}")
-    logger.debug(f"Request URL: {request.url}")
-    logger.debug(f"Request headers: {dict(request.headers)}")
-    logger.debug(f"Request content type: {request.content_type}")
-    logger.debug(f"Request form data keys: {list(request.form.keys())}")
-    logger.debug(f"Request files keys: {list(request.files.keys())}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request method: %s", request.method)
+        logger.debug("Request URL: %s", request.url)
+        logger.debug("Request content type: %s", request.content_type)
+        logger.debug("Request form data keys: %s", list(request.form.keys()))
+        logger.debug("Request files keys: %s", list(request.files.keys()))
 
     try:
         if 'file' not in request.files:
@@ -151,19 +186,25 @@ def upload_file():
             return jsonify({'success': False, 'message': 'No file selected'}), 400
 
         file = request.files['file']
-        logger.info(f"Processing file: {file.filename}")
-        logger.debug(f"File content type: {file.content_type}")
-        logger.debug(
-            f"File size: {file.content_length if file.content_length else 'unknown'}")
+        logger.info("Processing file: %s", file.filename)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("File content type: %s", file.content_type)
+            logger.debug("File size: %s", file.content_length or 'unknown')
+
+        # With recipients attached, encrypt straight from the upload so the
+        # plaintext is never written to the upload folder
+        recipient_keys = request.form.getlist('recipients')
+        if recipient_keys:
+            return _encrypt_upload(file, recipient_keys)
 
         success, filename, message = save_uploaded_file(file)
-        logger.info(
-            f"File save result: success={success}, filename={filename}, message={message}")
+        logger.info("File save result: success=%s, filename=%s, message=%s",
+                    success, filename, message)
 
         if success:
             file_size = get_file_size(filename)
-            logger.info(
-                f"File uploaded successfully: {filename}, size: {file_size} bytes")
+            logger.info("File uploaded successfully: %s, size: %d bytes",
+                        filename, file_size)
             return jsonify({
                 'success': True,
                 'filename': filename,
@@ -171,11 +212,11 @@ def upload_file():
                 'message': message
             })
         else:
-            logger.error(f"File upload failed: {message}")
+            logger.error("File upload failed: %s", message)
             return jsonify({'success': False, 'message': message}), 400
 
     except Exception as e:
-        logger.error(f"Unexpected error in file upload: {str(e)}")
+        logger.error("Unexpected error in file upload: %s", e)
         logger.exception("Full traceback:")
         return jsonify({
             'success': False,
@@ -203,7 +244,7 @@ def encrypt_file():
             'message': 'File not found'
         }), 404
 
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
 
     # Create output filename
     name, ext = os.path.splitext(filename)
@@ -215,9 +256,12 @@ def encrypt_file():
 
     if result['success']:
         # Delete original file
-        delete_file(filename)
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
 
-        file_size = get_file_size(encrypted_filename)
+        file_size = os.stat(encrypted_path).st_size
         return jsonify({
             'success': True,
             'encrypted_filename': encrypted_filename,
@@ -239,8 +283,8 @@ def decrypt_file():
     filename = request.form.get('filename')
     passphrase = request.form.get('passphrase')
 
-    logger.info(f"Decrypting file: {filename}")
-    logger.debug(f"Passphrase provided: {'Yes' if passphrase else 'No'}")
+    logger.info("Decrypting file: %s", filename)
+    logger.debug("Passphrase provided: %s", bool(passphrase))
 
     if not filename:
         logger.error("No filename provided in request")
@@ -250,52 +294,49 @@ def decrypt_file():
         }), 400
 
     file_path = get_file_path(filename)
-    logger.debug(f"File path: {file_path}")
+    logger.debug("File path: %s", file_path)
 
     if not os.path.exists(file_path):
-        logger.error(f"File not found: {file_path}")
+        logger.error("File not found: %s", file_path)
         return jsonify({
             'success': False,
             'message': 'File not found'
         }), 404
 
-    logger.info("Initializing PGP service for decryption")
-    pgp_service = PGPService()
+    pgp_service = get_pgp_service()
 
     # Create output filename
     name, ext = os.path.splitext(filename)
-    if name.endswith('_encrypted'):
-        name = name.replace('_encrypted', '_decrypted')
-    else:
-        name = f"{name}_decrypted"
 
-    # Remove .gpg extension if present
+    # Remove .gpg extension if present and recover the original extension
     if ext == '.gpg':
-        # Try to determine original extension
-        base_name, original_ext = os.path.splitext(name)
-        if original_ext:
-            decrypted_filename = f"{base_name}{original_ext}"
-        else:
-            decrypted_filename = f"{name}.txt"
-    else:
-        decrypted_filename = f"{name}{ext}"
+        name, ext = os.path.splitext(name)
+        ext = ext or '.txt'
+
+    if name.endswith('_encrypted'):
+        name = name[:-len('_encrypted')]
+    decrypted_filename = f"{name}_decrypted{ext}"
 
     decrypted_path = get_file_path(decrypted_filename)
-    logger.info(f"Output file will be: {decrypted_filename}")
-    logger.debug(f"Output path: {decrypted_path}")
+    logger.info("Output file will be: %s", decrypted_filename)
+    logger.debug("Output path: %s", decrypted_path)
 
     logger.info("Starting file decryption process")
     result = pgp_service.decrypt_file(file_path, passphrase, decrypted_path)
-    logger.info(f"Decryption result: {result}")
+    logger.info("Decryption result: success=%s, message=%s",
+                result['success'], result['message'])
 
     if result['success']:
         logger.info("File decrypted successfully, deleting encrypted file")
         # Delete encrypted file
-        delete_file(filename)
-
-        file_size = get_file_size(decrypted_filename)
-        logger.info(
-            f"Decryption complete: {decrypted_filename}, size: {file_size} bytes")
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+        file_size = os.stat(decrypted_path).st_size
+        logger.info("Decryption complete: %s, size: %d bytes",
+                    decrypted_filename, file_size)
         return jsonify({
             'success': True,
             'decrypted_filename': decrypted_filename,
@@ -303,7 +344,7 @@ def decrypt_file():
             'message': 'File decrypted successfully'
         })
     else:
-        logger.error(f"File decryption failed: {result['message']}")
+        logger.error("File decryption failed: %s", result['message'])
         return jsonify({
             'success': False,
             'message': result['message']
@@ -319,7 +360,9 @@ def download_file(filename):
             flash('File not found.', 'error')
             return redirect(url_for('main.index'))
 
-        return send_file(file_path, as_attachment=True, download_name=filename)
+        # Fixed mimetype skips type sniffing; conditional enables Range/304
+        return send_file(file_path, as_attachment=True, download_name=filename,
+                         mimetype='application/octet-stream', conditional=True)
     except Exception as e:
         flash(f'Error downloading file: {str(e)}', 'error')
         return redirect(url_for('main.index'))
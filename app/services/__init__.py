@@ -1,3 +1,24 @@
 """
 Services package initialization
 """
+import threading
+from flask import current_app
+
+_service_lock = threading.Lock()
+
+
+def get_pgp_service():
+    """Return the application's shared PGP service, creating it on first use."""
+    service = current_app.extensions.get('pgp_service')
+    if service is None:
+        with _service_lock:
+            service = current_app.extensions.get('pgp_service')
+            if service is None:
+                # Imported here so gnupg is only loaded once a request needs it
+                from app.services.pgp_service import PGPService
+                service = PGPService(
+                    current_app.config['GNUPG_HOME'],
+                    keys_cache_ttl=current_app.config.get('KEYS_CACHE_TTL', 30)
+                )
+                current_app.extensions['pgp_service'] = service
+    return service
@@ -2,19 +2,84 @@
 PGP Service for handling encryption, decryption, and key management
 """
 import os
+import struct
 import gnupg
 import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
 from typing import Optional, List, Dict, Any, Tuple
 from flask import current_app
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Use AES and SHA-2 for bulk encryption and digests so gpg runs on
+# libgcrypt's AES-NI/SHA-NI code paths instead of legacy CAST5/3DES
+GPG_OPTIONS = [
+    '--cipher-algo', 'AES256',
+    '--digest-algo', 'SHA256',
+    '--personal-cipher-preferences', 'AES256 AES192 AES',
+    '--personal-digest-preferences', 'SHA512 SHA256',
+]
+
+# Already-compressed formats; letting gpg deflate them again only burns CPU
+INCOMPRESSIBLE_EXTENSIONS = frozenset({
+    '.zip', '.docx', '.png', '.jpg', '.jpeg', '.gif', '.gpg', '.pgp',
+})
+
+# Keyring files whose modification times identify the keyring's state;
+# gpg rewrites pubring.kbx and adds or removes files in private-keys-v1.d
+# whenever keys change, from any process
+KEYRING_STATE_FILES = ('pubring.kbx', 'private-keys-v1.d')
+
+# GPG handles per GnuPG home; creating one runs gpg to probe its config
+_GPG_INSTANCES: Dict[str, gnupg.GPG] = {}
+_GPG_LOCK = threading.Lock()
+
+
+def _frame_payloads(payloads: List[bytes]) -> bytes:
+    """Join payloads into one buffer, each prefixed with its 4-byte length."""
+    return b''.join(struct.pack('>I', len(payload)) + payload
+                    for payload in payloads)
+
+
+def _unframe_payloads(data: bytes) -> List[bytes]:
+    """Split a buffer produced by _frame_payloads back into payloads."""
+    payloads = []
+    offset = 0
+    while offset < len(data):
+        if offset + 4 > len(data):
+            raise ValueError('Truncated batch frame header')
+        (length,) = struct.unpack_from('>I', data, offset)
+        offset += 4
+        if offset + length > len(data):
+            raise ValueError('Truncated batch frame payload')
+        payloads.append(data[offset:offset + length])
+        offset += length
+    return payloads
+
+
+def _partial_path(output_path: str) -> str:
+    """Return a hidden, unique sibling path for gpg to write output_path to."""
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex}.part")
+
+
+def _discard(path: Optional[str]) -> None:
+    """Remove a partial output file, ignoring it if gpg never created it."""
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
 
 class PGPService:
     """Service class for PGP operations using python-gnupg."""
 
-    def __init__(self, gnupg_home: Optional[str] = None):
+    def __init__(self, gnupg_home: Optional[str] = None, keys_cache_ttl: float = 30):
         """Initialize the PGP service with a GnuPG home directory."""
         logger.info("Initializing PGP service")
 
@@ -22,12 +87,35 @@ class PGPService:
             gnupg_home = current_app.config.get('GNUPG_HOME')
 
         self.gnupg_home = gnupg_home
-        logger.info(f"Using GnuPG home directory: {self.gnupg_home}")
-
-        os.makedirs(self.gnupg_home, exist_ok=True)
+        logger.info("Using GnuPG home directory: %s", self.gnupg_home)
+
+        # The home directory is created once by create_app(), not per service
+        # Initialize GnuPG, reusing this process's handle for the same home
+        with _GPG_LOCK:
+            gpg = _GPG_INSTANCES.get(self.gnupg_home)
+            if gpg is None:
+                gpg = gnupg.GPG(gnupghome=self.gnupg_home, options=GPG_OPTIONS)
+                _GPG_INSTANCES[self.gnupg_home] = gpg
+        self.gpg = gpg
+
+        # The service is shared across request threads; serialize keyring writes
+        self._lock = threading.Lock()
+
+        # Key listings per secret flag as (fetched_at, keyring_state, keys),
+        # plus a lookup by key ID/fingerprint. An entry is stale once the
+        # keyring files change on disk, which also catches changes made by
+        # other worker processes; the TTL is only a backstop
+        self.keys_cache_ttl = keys_cache_ttl
+        self._keyring_paths = [os.path.join(self.gnupg_home, name)
+                               for name in KEYRING_STATE_FILES]
+        self._keys_cache = {False: None, True: None}
+        self._keys_index = None
+
+        # Bumped on every invalidation, so a listing that was already running
+        # when the keyring changed is not stored as fresh
+        self._keys_generation = 0
+        self._keys_cache_lock = threading.Lock()
 
-        # Initialize GnuPG
-        self.gpg = gnupg.GPG(gnupghome=self.gnupg_home)
         logger.info("PGP service initialized successfully")
 
     def generate_key_pair(self, name: str, email: str, passphrase: str = None,
@@ -54,7 +142,9 @@ class PGPService:
                 key_length=key_length
             )
 
-            key = self.gpg.gen_key(input_data)
+            with self._lock:
+                key = self.gpg.gen_key(input_data)
+                self._invalidate_keys_cache()
 
             if key.fingerprint:
                 return {
@@ -69,7 +159,7 @@ class PGPService:
                 }
 
         except Exception as e:
-            logger.error(f"Error generating key pair: {str(e)}")
+            logger.error("Error generating key pair: %s", e)
             return {
                 'success': False,
                 'message': f'Error generating key pair: {str(e)}'
@@ -85,7 +175,14 @@ class PGPService:
         Returns:
             List of key dictionaries
         """
+        state = self._keyring_state()
+        entry = self._keys_cache[secret]
+        if (entry is not None and entry[1] == state
+                and time.monotonic() - entry[0] < self.keys_cache_ttl):
+            return entry[2]
+
         try:
+            generation = self._keys_generation
             keys = self.gpg.list_keys(secret=secret)
             formatted_keys = []
 
@@ -103,12 +200,59 @@ class PGPService:
                 }
                 formatted_keys.append(formatted_key)
 
+            with self._keys_cache_lock:
+                if self._keys_generation == generation:
+                    self._keys_cache[secret] = (time.monotonic(), state,
+                                                formatted_keys)
             return formatted_keys
 
         except Exception as e:
-            logger.error(f"Error listing keys: {str(e)}")
+            logger.error("Error listing keys: %s", e)
             return []
 
+    def find_key(self, keyid: str) -> Optional[Dict[str, Any]]:
+        """
+        Find a public or private key by its ID or fingerprint.
+
+        Args:
+            keyid: The key ID or fingerprint
+
+        Returns:
+            Key dictionary, or None if no key matches
+        """
+        public_keys = self.list_keys(secret=False)
+        private_keys = self.list_keys(secret=True)
+
+        # Rebuild the lookup only when either listing was refreshed
+        entry = self._keys_index
+        if entry is None or entry[0] is not public_keys or entry[1] is not private_keys:
+            index = {}
+            # Public keys are indexed last so they take precedence
+            for keys in (private_keys, public_keys):
+                for key in keys:
+                    index[key['keyid']] = key
+                    index[key['fingerprint']] = key
+            entry = self._keys_index = (public_keys, private_keys, index)
+
+        return entry[2].get(keyid)
+
+    def _keyring_state(self) -> Tuple[Optional[int], ...]:
+        """Return the modification times of the keyring files."""
+        state = []
+        for path in self._keyring_paths:
+            try:
+                state.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def _invalidate_keys_cache(self) -> None:
+        """Drop cached key listings after the keyring has changed."""
+        with self._keys_cache_lock:
+            self._keys_generation += 1
+            self._keys_cache = {False: None, True: None}
+            self._keys_index = None
+
     def import_key(self, key_data: str) -> Dict[str, Any]:
         """
         Import a PGP key from key data.
@@ -120,7 +264,9 @@ class PGPService:
             Dictionary with import results
         """
         try:
-            import_result = self.gpg.import_keys(key_data)
+            with self._lock:
+                import_result = self.gpg.import_keys(key_data)
+                self._invalidate_keys_cache()
 
             if import_result.count > 0:
                 return {
@@ -136,7 +282,7 @@ class PGPService:
                 }
 
         except Exception as e:
-            logger.error(f"Error importing key: {str(e)}")
+            logger.error("Error importing key: %s", e)
             return {
                 'success': False,
                 'message': f'Error importing key: {str(e)}'
@@ -156,11 +302,11 @@ class PGPService:
         try:
             return self.gpg.export_keys(keyid, secret=secret)
         except Exception as e:
-            logger.error(f"Error exporting key {keyid}: {str(e)}")
+            logger.error("Error exporting key %s: %s", keyid, e)
             return None
 
     def encrypt_data(self, data: bytes, recipient_keyids: List[str],
-                     armor: bool = True) -> Dict[str, Any]:
+                     armor: bool = False) -> Dict[str, Any]:
         """
         Encrypt data for specified recipients.
 
@@ -170,13 +316,14 @@ class PGPService:
             armor: If True, return ASCII-armored output
 
         Returns:
-            Dictionary with encryption results
+            Dictionary with encryption results; 'data' holds the ciphertext
+            as bytes
         """
         try:
-            logger.info(
-                f"Starting encryption for {len(recipient_keyids)} recipients")
-            logger.debug(f"Data size: {len(data)} bytes")
-            logger.debug(f"Recipient key IDs: {recipient_keyids}")
+            logger.info("Starting encryption for %d recipients",
+                        len(recipient_keyids))
+            logger.debug("Data size: %d bytes", len(data))
+            logger.debug("Recipient key IDs: %s", recipient_keyids)
 
             encrypted_data = self.gpg.encrypt(
                 data,
@@ -188,20 +335,20 @@ class PGPService:
                 logger.info("Data encrypted successfully")
                 return {
                     'success': True,
-                    'data': str(encrypted_data),
+                    'data': encrypted_data.data,
                     'message': 'Data encrypted successfully'
                 }
             else:
-                logger.error(
-                    f"Encryption failed with status: {encrypted_data.status}")
-                logger.error(f"Encryption stderr: {encrypted_data.stderr}")
+                logger.error("Encryption failed with status: %s",
+                             encrypted_data.status)
+                logger.error("Encryption stderr: %s", encrypted_data.stderr)
                 return {
                     'success': False,
                     'message': f'Encryption failed: {encrypted_data.status}'
                 }
 
         except Exception as e:
-            logger.error(f"Error encrypting data: {str(e)}")
+            logger.error("Error encrypting data: %s", e)
             return {
                 'success': False,
                 'message': f'Error encrypting data: {str(e)}'
@@ -221,50 +368,174 @@ class PGPService:
         try:
             logger.info("Starting data decryption")
 
-            # Handle both bytes and string data
-            if isinstance(encrypted_data, bytes):
-                data_len = len(encrypted_data)
-                unit = "bytes"
-            else:
-                data_len = len(encrypted_data)
-                unit = "characters"
-
-            logger.debug(f"Encrypted data length: {data_len} {unit}")
-            logger.debug(
-                f"Passphrase provided: {'Yes' if passphrase else 'No'}")
+            if logger.isEnabledFor(logging.DEBUG):
+                # Handle both bytes and string data
+                unit = "bytes" if isinstance(encrypted_data, bytes) else "characters"
+                logger.debug("Encrypted data length: %d %s",
+                             len(encrypted_data), unit)
+                logger.debug("Passphrase provided: %s",
+                             'Yes' if passphrase else 'No')
 
             decrypted_data = self.gpg.decrypt(
                 encrypted_data, passphrase=passphrase)
 
             if decrypted_data.ok:
                 logger.info("Data decrypted successfully")
-                logger.debug(
-                    f"Decrypted data size: {len(decrypted_data.data)} bytes")
+                logger.debug("Decrypted data size: %d bytes",
+                             len(decrypted_data.data))
                 return {
                     'success': True,
                     'data': decrypted_data.data,
                     'message': 'Data decrypted successfully'
                 }
             else:
-                logger.error(
-                    f"Decryption failed with status: {decrypted_data.status}")
-                logger.error(f"Decryption stderr: {decrypted_data.stderr}")
-                logger.debug(
-                    f"Available private keys: {[key['keyid'] for key in self.list_keys(secret=True)]}")
+                logger.error("Decryption failed with status: %s",
+                             decrypted_data.status)
+                logger.error("Decryption stderr: %s", decrypted_data.stderr)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Available private keys: %s",
+                                 [key['keyid'] for key in self.list_keys(secret=True)])
                 return {
                     'success': False,
                     'message': f'Decryption failed: {decrypted_data.status}'
                 }
 
         except Exception as e:
-            logger.error(f"Error decrypting data: {str(e)}")
+            logger.error("Error decrypting data: %s", e)
             return {
                 'success': False,
                 'message': f'Error decrypting data: {str(e)}'
             }
 
+    def encrypt_batch(self, items: List[Tuple[bytes, List[str]]],
+                      armor: bool = False) -> List[Dict[str, Any]]:
+        """
+        Encrypt many payloads with one gpg invocation per recipient set.
+
+        Payloads for the same recipients are length-prefixed and encrypted
+        together; decrypt_batch splits them apart again.
+
+        Args:
+            items: List of (data, recipient_keyids) tuples
+            armor: If True, return ASCII-armored output
+
+        Returns:
+            List of encryption results, one per recipient set, each with the
+            'indices' of the items it contains
+        """
+        groups = defaultdict(list)
+        for index, (_, recipient_keyids) in enumerate(items):
+            groups[frozenset(recipient_keyids)].append(index)
+
+        logger.info("Encrypting batch of %d items in %d groups",
+                    len(items), len(groups))
+
+        results = []
+        for recipients, indices in groups.items():
+            framed = _frame_payloads([items[i][0] for i in indices])
+            result = self.encrypt_data(framed, sorted(recipients), armor=armor)
+            result['indices'] = indices
+            results.append(result)
+
+        return results
+
+    def decrypt_batch(self, encrypted_data, passphrase: str = None) -> Dict[str, Any]:
+        """
+        Decrypt a group produced by encrypt_batch.
+
+        Args:
+            encrypted_data: One encrypted group as string or bytes
+            passphrase: Passphrase for the private key (if required)
+
+        Returns:
+            Dictionary with decryption results; 'items' holds the payloads
+        """
+        result = self.decrypt_data(encrypted_data, passphrase)
+        if not result['success']:
+            return result
+
+        try:
+            items = _unframe_payloads(result.pop('data'))
+        except ValueError as e:
+            logger.error("Error unpacking decrypted batch: %s", e)
+            return {
+                'success': False,
+                'message': f'Error unpacking decrypted batch: {str(e)}'
+            }
+
+        result['items'] = items
+        return result
+
+    def encrypt_stream(self, stream, recipient_keyids: List[str],
+                       output_path: str = None, filename: str = None,
+                       armor: bool = False) -> Dict[str, Any]:
+        """
+        Encrypt data read from a binary file-like object.
+
+        Args:
+            stream: File-like object to read the plaintext from
+            recipient_keyids: List of recipient key IDs
+            output_path: Output path for encrypted data (optional)
+            filename: Original filename, used to skip compressing
+                      already-compressed formats (optional)
+            armor: If True, produce ASCII-armored output
+
+        Returns:
+            Dictionary with encryption results; without output_path, 'data'
+            holds the ciphertext as bytes
+        """
+        # gpg writes to a temporary name that is only moved into place once
+        # the operation succeeded, so failures never leave output behind
+        partial_path = _partial_path(output_path) if output_path else None
+
+        try:
+            extra_args = None
+            if filename and os.path.splitext(filename)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+                extra_args = ['--compress-algo', 'none']
+
+            # Stream the data through gpg; with an output path gpg writes the
+            # ciphertext itself and nothing is buffered in Python
+            encrypted_data = self.gpg.encrypt_file(
+                stream,
+                recipient_keyids,
+                armor=armor,
+                output=partial_path,
+                extra_args=extra_args
+            )
+
+            if not encrypted_data.ok:
+                _discard(partial_path)
+                logger.error("Encryption failed with status: %s",
+                             encrypted_data.status)
+                logger.error("Encryption stderr: %s", encrypted_data.stderr)
+                return {
+                    'success': False,
+                    'message': f'Encryption failed: {encrypted_data.status}'
+                }
+
+            result = {
+                'success': True,
+                'message': 'Data encrypted successfully'
+            }
+            if output_path:
+                os.replace(partial_path, output_path)
+                result['output_path'] = output_path
+                logger.info("Encrypted file saved successfully: %s", output_path)
+            else:
+                result['data'] = encrypted_data.data
+
+            return result
+
+        except Exception as e:
+            _discard(partial_path)
+            logger.error("Error encrypting stream: %s", e)
+            return {
+                'success': False,
+                'message': f'Error encrypting data: {str(e)}'
+            }
+
     def encrypt_file(self, file_path: str, recipient_keyids: List[str],
-                     output_path: str = None) -> Dict[str, Any]:
+                     output_path: str = None, armor: bool = False) -> Dict[str, Any]:
         """
         Encrypt a file for specified recipients.
 
@@ -272,44 +543,34 @@ class PGPService:
             file_path: Path to the file to encrypt
             recipient_keyids: List of recipient key IDs
             output_path: Output path for encrypted file (optional)
+            armor: If True, produce ASCII-armored output
 
         Returns:
             Dictionary with encryption results
         """
         try:
-            logger.info(f"Starting file encryption: {file_path}")
-            logger.debug(f"Recipients: {recipient_keyids}")
-            logger.debug(f"Output path: {output_path}")
-
-            if not os.path.exists(file_path):
-                logger.error(f"File not found: {file_path}")
+            logger.info("Starting file encryption: %s", file_path)
+            logger.debug("Recipients: %s", recipient_keyids)
+            logger.debug("Output path: %s", output_path)
+
+            try:
+                f = open(file_path, 'rb')
+            except FileNotFoundError:
+                logger.error("File not found: %s", file_path)
                 return {
                     'success': False,
                     'message': 'File not found'
                 }
 
-            file_size = os.path.getsize(file_path)
-            logger.info(f"File size: {file_size} bytes")
-
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-
-            logger.debug(
-                f"File data read successfully, size: {len(file_data)} bytes")
-
-            result = self.encrypt_data(file_data, recipient_keyids)
-
-            if result['success'] and output_path:
-                logger.info(f"Writing encrypted data to: {output_path}")
-                with open(output_path, 'w') as f:
-                    f.write(result['data'])
-                result['output_path'] = output_path
-                logger.info("Encrypted file saved successfully")
+            with f:
+                file_size = os.fstat(f.fileno()).st_size
+                logger.info("File size: %d bytes", file_size)
 
-            return result
+                return self.encrypt_stream(f, recipient_keyids, output_path,
+                                           filename=file_path, armor=armor)
 
         except Exception as e:
-            logger.error(f"Error encrypting file {file_path}: {str(e)}")
+            logger.error("Error encrypting file %s: %s", file_path, e)
             return {
                 'success': False,
                 'message': f'Error encrypting file: {str(e)}'
@@ -328,46 +589,72 @@ class PGPService:
         Returns:
             Dictionary with decryption results
         """
-        try:
-            logger.info(f"Starting file decryption: {file_path}")
-            logger.debug(
-                f"Passphrase provided: {'Yes' if passphrase else 'No'}")
-            logger.debug(f"Output path: {output_path}")
+        # As in encrypt_stream, only a successful decryption reaches output_path;
+        # gpg may already have written plaintext that failed its integrity check
+        partial_path = _partial_path(output_path) if output_path else None
 
-            if not os.path.exists(file_path):
-                logger.error(f"File not found: {file_path}")
+        try:
+            logger.info("Starting file decryption: %s", file_path)
+            logger.debug("Passphrase provided: %s", 'Yes' if passphrase else 'No')
+            logger.debug("Output path: %s", output_path)
+
+            try:
+                f = open(file_path, 'rb')
+            except FileNotFoundError:
+                logger.error("File not found: %s", file_path)
                 return {
                     'success': False,
                     'message': 'File not found'
                 }
 
-            file_size = os.path.getsize(file_path)
-            logger.info(f"Encrypted file size: {file_size} bytes")
+            # Stream the file through gpg; with an output path gpg writes the
+            # plaintext itself and nothing is buffered in Python
+            with f:
+                file_size = os.fstat(f.fileno()).st_size
+                logger.info("Encrypted file size: %d bytes", file_size)
 
-            with open(file_path, 'rb') as f:
-                encrypted_data = f.read()
+                decrypted_data = self._decrypt_stream(f, passphrase, partial_path)
 
-            logger.debug(
-                f"Encrypted data read successfully, length: {len(encrypted_data)} bytes")
-
-            result = self.decrypt_data(encrypted_data, passphrase)
+            if not decrypted_data.ok:
+                _discard(partial_path)
+                logger.error("Decryption failed with status: %s",
+                             decrypted_data.status)
+                logger.error("Decryption stderr: %s", decrypted_data.stderr)
+                return {
+                    'success': False,
+                    'message': f'Decryption failed: {decrypted_data.status}'
+                }
 
-            if result['success'] and output_path:
-                logger.info(f"Writing decrypted data to: {output_path}")
-                with open(output_path, 'wb') as f:
-                    f.write(result['data'])
+            result = {
+                'success': True,
+                'message': 'Data decrypted successfully'
+            }
+            if output_path:
+                os.replace(partial_path, output_path)
                 result['output_path'] = output_path
-                logger.info("Decrypted file saved successfully")
+                logger.info("Decrypted file saved successfully: %s", output_path)
+            else:
+                result['data'] = decrypted_data.data
 
             return result
 
         except Exception as e:
-            logger.error(f"Error decrypting file {file_path}: {str(e)}")
+            _discard(partial_path)
+            logger.error("Error decrypting file %s: %s", file_path, e)
             return {
                 'success': False,
                 'message': f'Error decrypting file: {str(e)}'
             }
 
+    def _decrypt_stream(self, stream, passphrase: str = None,
+                        output_path: str = None):
+        """Decrypt data read from a binary file-like object."""
+        return self.gpg.decrypt_file(
+            stream,
+            passphrase=passphrase,
+            output=output_path
+        )
+
     def delete_key(self, keyid: str, secret: bool = False) -> Dict[str, Any]:
         """
         Delete a key by its ID.
@@ -380,7 +667,9 @@ class PGPService:
             Dictionary with deletion results
         """
         try:
-            result = self.gpg.delete_keys(keyid, secret=secret)
+            with self._lock:
+                result = self.gpg.delete_keys(keyid, secret=secret)
+                self._invalidate_keys_cache()
 
             if result.status == 'ok':
                 return {
@@ -394,7 +683,7 @@ class PGPService:
                 }
 
         except Exception as e:
-            logger.error(f"Error deleting key {keyid}: {str(e)}")
+            logger.error("Error deleting key %s: %s", keyid, e)
             return {
                 'success': False,
                 'message': f'Error deleting key: {str(e)}'
@@ -2,18 +2,75 @@
 Utility functions for file handling and validation
 """
 import os
-import uuid
+import re
+import stat
+import tempfile
 import logging
+import threading
 from werkzeug.utils import secure_filename
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+SIZE_NAMES = ('B', 'KB', 'MB', 'GB')
+
+# Anything outside this set is collapsed to '_' in stored filenames
+_UNSAFE_FILENAME_RE = re.compile(r'[^A-Za-z0-9._-]+')
+
+# Random bytes for unique filenames, refilled from os.urandom in bulk
+_RAND_POOL = bytearray()
+_RAND_LOCK = threading.Lock()
+_RAND_REFILL_SIZE = 4096
+
+# Forked workers must not hand out the parent's leftover bytes
+os.register_at_fork(after_in_child=_RAND_POOL.clear)
+
+
+def _random_bytes(n):
+    """Return n random bytes from the shared pool."""
+    with _RAND_LOCK:
+        if len(_RAND_POOL) < n:
+            _RAND_POOL.extend(os.urandom(_RAND_REFILL_SIZE))
+        chunk = bytes(_RAND_POOL[:n])
+        del _RAND_POOL[:n]
+    return chunk
+
 
 def allowed_file(filename):
     """Check if file extension is allowed."""
-    return ('.' in filename and
-            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS'])
+    return _allowed_file(filename, current_app.config['ALLOWED_EXTENSIONS'])
+
+
+def _allowed_file(filename, allowed):
+    """Check filename's extension against a set of allowed extensions."""
+    dot = filename.rfind('.')
+    if dot < 0:
+        return False
+    return filename[dot + 1:].lower() in allowed
+
+
+def safe_filename(filename, strict=None):
+    """
+    Reduce a filename to a safe ASCII name for the upload folder.
+
+    Path separators and other unsafe characters become '_' and leading dots
+    are dropped. Set STRICT_FILENAMES (or pass strict=True) to use
+    werkzeug's secure_filename.
+    """
+    if strict is None:
+        strict = current_app.config.get('STRICT_FILENAMES')
+    if strict:
+        return secure_filename(filename)
+
+    name = _UNSAFE_FILENAME_RE.sub('_', filename.strip()).lstrip('._')
+    stem, ext = os.path.splitext(name)
+    return stem[:100] + ext[:20] or 'unnamed'
+
+
+def unique_filename(filename, strict=None):
+    """Return a safe version of filename with a random suffix."""
+    name, ext = os.path.splitext(safe_filename(filename, strict))
+    return f"{name}_{_random_bytes(4).hex()}{ext}"
 
 
 def save_uploaded_file(file, custom_filename=None):
@@ -30,65 +87,102 @@ def save_uploaded_file(file, custom_filename=None):
     try:
         logger.info("Starting file upload process")
 
+        # Resolve the app config proxy once for the whole save
+        cfg = current_app.config
+        upload_folder = cfg['UPLOAD_FOLDER']
+        strict = cfg.get('STRICT_FILENAMES')
+
         if not file or file.filename == '':
             logger.error("No file provided or empty filename")
             return False, None, 'No file selected'
 
-        logger.info(f"Processing file: {file.filename}")
-        logger.debug(
-            f"File size: {file.content_length if hasattr(file, 'content_length') else 'unknown'}")
+        logger.info("Processing file: %s", file.filename)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("File size: %s", getattr(file, 'content_length', 'unknown'))
 
-        if not allowed_file(file.filename):
-            logger.error(f"File type not allowed: {file.filename}")
+        if not _allowed_file(file.filename, cfg['ALLOWED_EXTENSIONS']):
+            logger.error("File type not allowed: %s", file.filename)
             return False, None, 'File type not allowed'
 
         if custom_filename:
-            filename = secure_filename(custom_filename)
-            logger.debug(f"Using custom filename: {filename}")
+            filename = safe_filename(custom_filename, strict)
+            logger.debug("Using custom filename: %s", filename)
         else:
-            # Generate unique filename
-            filename = secure_filename(file.filename)
-            name, ext = os.path.splitext(filename)
-            filename = f"{name}_{uuid.uuid4().hex[:8]}{ext}"
-            logger.debug(f"Generated unique filename: {filename}")
-
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        logger.debug(f"Saving file to: {file_path}")
+            filename = unique_filename(file.filename, strict)
+            logger.debug("Generated unique filename: %s", filename)
 
-        # Ensure upload directory exists
-        os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+        file_path = get_file_path(filename, upload_folder)
+        logger.debug("Saving file to: %s", file_path)
 
-        file.save(file_path)
+        _write_upload(file, file_path)
 
         # Verify file was saved
-        if os.path.exists(file_path):
-            saved_size = os.path.getsize(file_path)
-            logger.info(
-                f"File saved successfully: {filename}, size: {saved_size} bytes")
-        else:
-            logger.error(f"File was not saved properly: {file_path}")
+        try:
+            saved_size = os.stat(file_path).st_size
+        except FileNotFoundError:
+            logger.error("File was not saved properly: %s", file_path)
             return False, None, 'File was not saved properly'
+        logger.info("File saved successfully: %s, size: %d bytes",
+                    filename, saved_size)
 
         return True, filename, 'File uploaded successfully'
 
     except Exception as e:
-        logger.error(f"Error saving file: {str(e)}")
+        logger.error("Error saving file: %s", e)
         return False, None, f'Error saving file: {str(e)}'
 
 
-def get_file_path(filename):
+def _write_upload(file, file_path):
+    """
+    Write an uploaded file to disk.
+
+    Large uploads are spooled by werkzeug to a temporary file; those are
+    copied from the current position with sendfile(2) inside the kernel.
+    Everything else, or platforms without sendfile, falls back to a
+    buffered copy.
+    """
+    stream = file.stream
+    if _disk_backed(stream):
+        try:
+            src_fd = stream.fileno()
+            st = os.fstat(src_fd)
+            if stat.S_ISREG(st.st_mode):
+                with open(file_path, 'wb') as dst:
+                    offset = stream.tell()
+                    while offset < st.st_size:
+                        sent = os.sendfile(dst.fileno(), src_fd, offset,
+                                           st.st_size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                return
+        except (AttributeError, OSError):
+            pass
+
+    # Copy in 1 MiB chunks rather than werkzeug's 16 KiB default
+    file.save(file_path, buffer_size=1 << 20)
+
+
+def _disk_backed(stream):
+    """Return True if stream is a werkzeug upload spooled to disk."""
+    # _rolled is a private CPython attribute of SpooledTemporaryFile; calling
+    # fileno() on a spool still held in memory would roll it over to disk
+    return (isinstance(stream, tempfile.SpooledTemporaryFile)
+            and getattr(stream, '_rolled', False))
+
+
+def get_file_path(filename, upload_folder=None):
     """Get the full path for a filename in the upload folder."""
-    return os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    if upload_folder is None:
+        upload_folder = current_app.config['UPLOAD_FOLDER']
+    return os.path.join(upload_folder, filename)
 
 
 def delete_file(filename):
     """Delete a file from the upload folder."""
     try:
-        file_path = get_file_path(filename)
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            return True
-        return False
+        os.remove(get_file_path(filename))
+        return True
     except Exception:
         return False
 
@@ -96,21 +190,17 @@ def delete_file(filename):
 def get_file_size(filename):
     """Get file size in bytes."""
     try:
-        file_path = get_file_path(filename)
-        return os.path.getsize(file_path)
+        return os.stat(get_file_path(filename)).st_size
     except Exception:
         return 0
 
 
 def format_file_size(size_bytes):
     """Format file size in human readable format."""
-    if size_bytes == 0:
+    if size_bytes <= 0:
         return "0 B"
 
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024.0
-        i += 1
-
-    return f"{size_bytes:.1f} {size_names[i]}"
+    # Each unit is 2**10 of the previous one, so the bit length picks it;
+    # fractional sizes under one byte have bit length 0 and stay in B
+    i = min(max((int(size_bytes).bit_length() - 1) // 10, 0), len(SIZE_NAMES) - 1)
+    return f"{size_bytes / (1 << (10 * i)):.1f} {SIZE_NAMES[i]}"